@@ -30,11 +30,12 @@ if not (
 
 
 
-import types, builtins, collections, pathlib, re, string
+import types, builtins, collections, functools, pathlib, re, string
 import logging, difflib, time
-import shlex, subprocess
-import contextlib
-import ast, traceback
+import subprocess
+import contextlib, dataclasses, io
+import ast, traceback, bisect, heapq
+import marshal, hashlib, importlib.util
 import __main__
 
 
@@ -48,10 +49,10 @@ import __main__
 
 def coalesce(key_value_pairs):
 
-    pool = collections.defaultdict(lambda: [])
+    pool = collections.defaultdict(list)
 
     for key, value in key_value_pairs:
-        pool[key] += [value]
+        pool[key].append(value)
 
     return tuple(pool.items())
 
@@ -64,29 +65,36 @@ def coalesce(key_value_pairs):
 
 
 
+JUSTIFICATION_METHODS = {
+    '<' : str.ljust,
+    '>' : str.rjust,
+    '^' : str.center,
+}
+
 def justify(rows):
 
-    rows = tuple(tuple(row) for row in rows)
 
 
+    # Each value that'll be justified is stringified only once.
 
-    # Determine the amount of justification needed for each column.
+    rows = tuple(
+        tuple(
+            (justification, value if justification is None else str(value))
+            for justification, value in row
+        )
+        for row in rows
+    )
 
-    column_max_lengths = {
 
-        column_i : max([
-            len(str(value))
-            for justification, value in cells
-            if justification is not None
-        ] or [0])
 
-        for column_i, cells in coalesce(
-            (column_i, cell)
-            for row in rows
-            for column_i, cell in enumerate(row)
-        )
+    # Determine the amount of justification needed for each column.
 
-    }
+    column_max_lengths = collections.defaultdict(int)
+
+    for row in rows:
+        for column_i, (justification, value) in enumerate(row):
+            if justification is not None:
+                column_max_lengths[column_i] = max(column_max_lengths[column_i], len(value))
 
 
 
@@ -100,14 +108,14 @@ def justify(rows):
 
         for column_i, (justification, value) in enumerate(row):
 
-            match justification:
-                case None : just_row += [    value                                      ]
-                case '<'  : just_row += [str(value).ljust (column_max_lengths[column_i])]
-                case '>'  : just_row += [str(value).rjust (column_max_lengths[column_i])]
-                case '^'  : just_row += [str(value).center(column_max_lengths[column_i])]
-                case _    : raise ValueError(f'Unknown justification: {repr(justification)}.')
+            if justification is None:
+                just_row.append(value)
+            elif justification in JUSTIFICATION_METHODS:
+                just_row.append(JUSTIFICATION_METHODS[justification](value, column_max_lengths[column_i]))
+            else:
+                raise ValueError(f'Unknown justification: {repr(justification)}.')
 
-        just_rows += [just_row]
+        just_rows.append(just_row)
 
     return just_rows
 
@@ -166,16 +174,21 @@ ANSI_BG_BRIGHT_WHITE    = '\x1B[107m'
 
 def append_log_table(message, record):
 
-    if hasattr(record, 'table'):
+    if getattr(record, 'table', None):
 
-        for just_key, just_value in justify([
-            (
-                ('<' , str(key  )),
-                (None, str(value)),
-            )
-            for key, value in record.table
-        ]):
-            message += f'\n{just_key} : {just_value}'
+        # Only the keys need to be justified,
+        # so there's no need to go through `justify`.
+
+        table     = [(str(key), str(value)) for key, value in record.table]
+        key_width = max((len(key) for key, value in table), default = 0)
+
+        message = '\n'.join([
+            message,
+            *(
+                f'{key.ljust(key_width)} : {value}'
+                for key, value in table
+            ),
+        ])
 
     return message
 
@@ -188,26 +201,46 @@ def append_log_table(message, record):
 
 
 
+LOG_LEVEL_COLORINGS = {
+    'DEBUG'    : ANSI_FG_MAGENTA,
+    'INFO'     : ANSI_FG_CYAN,
+    'WARNING'  : ANSI_FG_YELLOW,
+    'ERROR'    : ANSI_FG_RED,
+    'CRITICAL' : ANSI_FG_RED + ANSI_BOLD,
+}
+
+LOG_LEVEL_INDENTS = {
+    level_name : ' ' * len(f'[{level_name}] ')
+    for level_name in LOG_LEVEL_COLORINGS
+}
+
+LOG_LEVEL_PREFIXES = {
+    level_name : f'{ANSI_RESET}{coloring}[{level_name}]{ANSI_RESET} '
+    for level_name, coloring in LOG_LEVEL_COLORINGS.items()
+}
+
+# Every character that `str.splitlines` would split on.
+
+LINE_BOUNDARY_PATTERN = re.compile('[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]')
+
 def prepend_log_level(message, record):
 
-    indent = ' ' * len(f'[{record.levelname}] ')
+    prefix = LOG_LEVEL_PREFIXES[record.levelname]
 
-    message = '\n'.join([
-        (message.splitlines() or [''])[0],
-        *[f'{indent}{line}' for line in message.splitlines()[1:]]
-    ])
 
-    coloring = {
-        'DEBUG'    : ANSI_FG_MAGENTA,
-        'INFO'     : ANSI_FG_CYAN,
-        'WARNING'  : ANSI_FG_YELLOW,
-        'ERROR'    : ANSI_FG_RED,
-        'CRITICAL' : ANSI_FG_RED + ANSI_BOLD,
-    }[record.levelname]
 
-    message = f'{ANSI_RESET}{coloring}[{record.levelname}]{ANSI_RESET} {message}'
+    # Single-line messages have nothing to indent.
 
-    return message
+    if not LINE_BOUNDARY_PATTERN.search(message):
+        return prefix + message
+
+
+
+    indent = LOG_LEVEL_INDENTS[record.levelname]
+
+    message = f'\n{indent}'.join(message.splitlines() or [''])
+
+    return prefix + message
 
 
 
@@ -220,11 +253,27 @@ def prepend_log_level(message, record):
 
 class MainFormatter(logging.Formatter):
 
+
+
+    # Some loggers leave certain log levels
+    # without the colored level prefix.
+
+    def __init__(self, *, unprefixed_level_names = ()):
+
+        super().__init__()
+
+        self.unprefixed_level_names = unprefixed_level_names
+
+
+
     def format(self, record):
 
-        message  = super().format(record)
-        message  = append_log_table(message, record)
-        message  = prepend_log_level(message, record)
+        message = super().format(record)
+        message = append_log_table(message, record)
+
+        if record.levelname not in self.unprefixed_level_names:
+            message = prepend_log_level(message, record)
+
         message += '\n'
 
         return message
@@ -246,10 +295,17 @@ pxd_logger.setLevel(logging.DEBUG)
 
 
 
+# The main script's path doesn't change, but the current
+# working directory can, so only the former is remembered.
+
+@functools.cache
+def get_main_file_path():
+    return pathlib.Path(__main__.__file__)
+
 def make_main_relative_path(*parts):
 
     return (
-        pathlib.Path(__main__.__file__)
+        get_main_file_path()
             .parent
             .joinpath(*parts)
             .relative_to(pathlib.Path.cwd(), walk_up = True)
@@ -266,22 +322,25 @@ def make_main_relative_path(*parts):
 
 def did_you_mean(message, given, options):
 
+    if not options: # Nothing to suggest from.
+        return message.format(repr(given))
+
     suggestions = difflib.get_close_matches(
         given,
         [str(option) for option in options],
     )
 
-    message += '\n'
+    lines = [message]
 
     for suggestion_i, suggestion in enumerate(suggestions):
-        line     = '... or {}?' if suggestion_i else 'Did you mean {}?'
-        line     = ' ' * (message.index('{}') - line.index('{}')) + line
-        message += line + '\n'
+        line   = '... or {}?' if suggestion_i else 'Did you mean {}?'
+        line   = ' ' * (message.index('{}') - line.index('{}')) + line
+        lines.append(line)
 
-    message = message.format(
+    message = '\n'.join(lines).format(
         repr(given),
         *[repr(suggestion) for suggestion in suggestions]
-    ).removesuffix('\n')
+    )
 
     return message
 
@@ -299,6 +358,16 @@ class ExecuteShellCommandNonZeroExitCode(Exception):
 
 
 
+# A shell token is either a double-quoted string (which ends right at the
+# closing quote) or a run of non-whitespace characters; this is the same
+# splitting that `shlex` does in non-POSIX mode with only '"' as a quote,
+# no commenters, and whitespace-splitting, but in a single regex scan.
+# An unmatched opening quote is captured so it can be reported.
+
+SHELL_TOKEN_PATTERN = re.compile(r'"[^"]*"|[^ \t\r\n"][^ \t\r\n]*|(")')
+
+
+
 def execute_shell_command(
     default    = None,
     *,
@@ -346,11 +415,16 @@ def execute_shell_command(
 
     for command_i in range(len(commands)):
 
-        lexer                  = shlex.shlex(commands[command_i])
-        lexer.quotes           = '"'
-        lexer.whitespace_split = True
-        lexer.commenters       = ''
-        commands[command_i]    = ' '.join(list(lexer))
+        tokens = []
+
+        for token_match in SHELL_TOKEN_PATTERN.finditer(commands[command_i]):
+
+            if token_match.group(1):
+                raise ValueError('No closing quotation')
+
+            tokens.append(token_match.group())
+
+        commands[command_i] = ' '.join(tokens)
 
 
 
@@ -370,26 +444,30 @@ def execute_shell_command(
             # have to invoke PowerShell to run the
             # command if PowerShell is needed.
 
-            processes += [subprocess.Popen(['pwsh', '-Command', command], shell = False)]
+            processes.append(subprocess.Popen(['pwsh', '-Command', command], shell = False))
 
         else:
 
-            processes += [subprocess.Popen(
+            processes.append(subprocess.Popen(
                 command,
                 shell  = True,
                 stdout = subprocess.PIPE if len(commands) >= 2 else None,
                 stderr = subprocess.PIPE if len(commands) >= 2 else None,
-            )]
+            ))
 
 
 
-    # Wait on each subprocess to be done.
+    # Wait on each subprocess to be done; if its output is piped,
+    # the pipes get drained as it goes so that a chatty command
+    # won't fill up the pipe buffer and block forever.
 
     non_zero_exit_code_found = False
 
     for process_i, process in enumerate(processes):
 
-        if process.wait():
+        stdout, stderr = process.communicate()
+
+        if process.returncode:
 
             non_zero_exit_code_found = True
 
@@ -405,11 +483,8 @@ def execute_shell_command(
                 # is pretty tricky unfortunately, and I don't
                 # have time for it.
 
-                for line in process.stdout:
-                    print(line.decode('UTF-8'), end = '')
-
-                for line in process.stderr:
-                    print(line.decode('UTF-8'), end = '')
+                print(stdout.decode('UTF-8'), end = '')
+                print(stderr.decode('UTF-8'), end = '')
 
             print()
 
@@ -434,10 +509,63 @@ def execute_shell_command(
 
 
 
+FLAG_ARGUMENT_PATTERN = re.compile(r'--([^=]*)(?:=(.*))?', re.DOTALL)
+
+
+
+# The spellings that boolean parameters accept.
+
+BOOLEAN_ARGUMENT_FALSY  = ('0', 'f', 'n', 'no' , 'false')
+BOOLEAN_ARGUMENT_TRUTHY = ('1', 't', 'y', 'yes', 'true' )
+BOOLEAN_ARGUMENT_VALUES = {
+    **dict.fromkeys(BOOLEAN_ARGUMENT_FALSY , False),
+    **dict.fromkeys(BOOLEAN_ARGUMENT_TRUTHY, True ),
+}
+
+
+
+# Verbs and their parameters are looked at on every invocation,
+# so their fields are kept in slots; hooks can read and update these
+# fields but can't attach attributes of their own.
+
+@dataclasses.dataclass(slots = True)
+class CommandLineInterfaceParameterSchema:
+    identifier_name : str
+    formatted_name  : str
+    flag_name       : str
+    description     : str
+    type            : object
+    has_default     : bool
+    default         : object
+    default_repr    : str | None
+    flag_only       : bool | None
+    options         : list | None
+
+@dataclasses.dataclass(slots = True)
+class CommandLineInterfaceVerb:
+    name                           : str
+    description                    : str
+    more_help                      : bool
+    parameter_schemas              : list
+    parameter_schemas_by_flag_name : dict
+    function                       : object
+    usage                          : str
+
+
+
 class CommandLineInterface:
 
 
 
+    # Parameters for showing the help of every verb; this is
+    # shared by every interface, so it's made immutable.
+
+    HELP_ALL_VERBS = collections.namedtuple('HelpParameters', ('verb_name',))(
+        verb_name = None,
+    )
+
+
+
     # Interfaces are where all verbs are
     # grouped together and are eventually invoked.
 
@@ -453,40 +581,31 @@ class CommandLineInterface:
 
 
         if name is ...:
-            name = f'{make_main_relative_path(pathlib.Path(__main__.__file__).name)}'
+            name = f'{make_main_relative_path(get_main_file_path().name)}'
 
         self.name = name
 
 
 
         if description is ...:
-            description = f'The {repr(pathlib.Path(__main__.__file__).name)} command line program.'
+            description = f'The {repr(get_main_file_path().name)} command line program.'
 
         self.description = description
 
 
 
-        if logger is ...:
-
-            class CommandLineInterfaceFormatter(logging.Formatter):
-
-                def format(self, record):
+        # The default logger is shared by every interface,
+        # so it only needs to be set up the first time.
 
-                    message = super().format(record)
-                    message = append_log_table(message, record)
-
-                    if record.levelname != 'INFO':
-                        message = prepend_log_level(message, record)
+        if logger is ...:
 
-                    message += '\n'
+            logger = logging.getLogger('pxd_CommandLineInterface')
 
-                    return message
-
-            logger         = logging.getLogger('pxd_CommandLineInterface')
-            logger_handler = logging.StreamHandler(sys.stdout)
-            logger_handler.setFormatter(CommandLineInterfaceFormatter())
-            logger.addHandler(logger_handler)
-            logger.setLevel(logging.DEBUG)
+            if not logger.handlers:
+                logger_handler = logging.StreamHandler(sys.stdout)
+                logger_handler.setFormatter(MainFormatter(unprefixed_level_names = ('INFO',)))
+                logger.addHandler(logger_handler)
+                logger.setLevel(logging.DEBUG)
 
         self.logger = logger
 
@@ -510,7 +629,11 @@ class CommandLineInterface:
 
 
 
-        self.verbs = []
+        # Verbs are kept in the order they were registered,
+        # but can also be looked up directly by name.
+
+        self.verbs          = []
+        self._verbs_by_name = {}
         self.new_verb(
             {
                 'description' : f"Show usage of {repr(self.name)}; pass 'all' for all details."
@@ -529,30 +652,29 @@ class CommandLineInterface:
 
     def help(self, parameters):
 
-        output = ''
+        output = []
 
 
 
         # Details of the interface itself.
 
-        output += f'> {ANSI_UNDERLINE}{ANSI_BOLD}{self.name} [verb] (parameters...){ANSI_RESET}' '\n'
-        output += f'{self.description}'                                                          '\n'
-        output += '\n'
+        output += [f'> {ANSI_UNDERLINE}{ANSI_BOLD}{self.name} [verb] (parameters...){ANSI_RESET}' '\n']
+        output += [f'{self.description}'                                                          '\n']
+        output += ['\n']
 
 
 
         # We want to show the `help` last so that
         # it'll be the first thing the user sees
         # if the list of verbs is very long.
+        # A specific verb can just be looked up.
 
-        shown_verbs = sorted(
-            [
-                verb
-                for verb in self.verbs
-                if parameters.verb_name in (verb.name, None, 'all')
-            ],
-            key = lambda verb: (verb.name == 'help')
-        )
+        if parameters.verb_name in (None, 'all'):
+            shown_verbs = sorted(self.verbs, key = lambda verb: (verb.name == 'help'))
+        elif parameters.verb_name in self._verbs_by_name:
+            shown_verbs = [self._verbs_by_name[parameters.verb_name]]
+        else:
+            shown_verbs = []
 
 
 
@@ -561,9 +683,7 @@ class CommandLineInterface:
 
         if not shown_verbs and parameters.verb_name not in (None, 'all'):
 
-            self.help(types.SimpleNamespace(
-                verb_name = None,
-            ))
+            self.help(self.HELP_ALL_VERBS)
 
             self.logger.error(did_you_mean(
                 'No verb goes by the name of {}.',
@@ -586,31 +706,21 @@ class CommandLineInterface:
             verbs_were_filtered_out = parameters.verb_name not in (None, 'all')
 
             if verbs_were_filtered_out:
-                output += '    ...' '\n'
-                output += '\n'
+                output += ['    ...' '\n']
+                output += ['\n']
 
 
 
-            # Verb name.
+            # Verb name and parameters in the invocation.
 
-            output += f'    > {ANSI_UNDERLINE}{ANSI_BOLD}{self.name} {ANSI_FG_GREEN}{verb.name}{ANSI_RESET}{ANSI_UNDERLINE}{ANSI_BOLD}'
-
-
-
-            # Verb parameters in the invocation.
-
-            for parameter_schema in verb.parameter_schemas:
-
-                output += f' {parameter_schema.formatted_name}'
-
-            output += f'{ANSI_RESET}' '\n'
+            output += [verb.usage]
 
 
 
             # Verb description.
 
-            output += f'    {verb.description}' '\n'
-            output += '\n'
+            output += [f'    {verb.description}' '\n']
+            output += ['\n']
 
 
 
@@ -625,23 +735,14 @@ class CommandLineInterface:
 
                 for parameter_schema in verb.parameter_schemas:
 
-                    output += f'        {parameter_schema.formatted_name} {parameter_schema.description}' '\n'
+                    output += [f'        {parameter_schema.formatted_name} {parameter_schema.description}' '\n']
 
 
 
                     # Show that the parameter is optional if applicable.
 
-                    if parameter_schema.has_default:
-
-                        match parameter_schema.default:
-
-                            case str() | int() | float() | bool():
-                                default = repr(parameter_schema.default)
-
-                            case _: # Not easily representable.
-                                default = '(optional)'
-
-                        output += f'            = {default}' '\n'
+                    if parameter_schema.default_repr is not None:
+                        output += [f'            = {parameter_schema.default_repr}' '\n']
 
 
 
@@ -654,11 +755,11 @@ class CommandLineInterface:
 
                             for option in parameter_schema.type:
 
-                                output += f'            - {repr(option)}\n'
+                                output += [f'            - {repr(option)}\n']
 
 
 
-                    output += '\n'
+                    output += ['\n']
 
 
 
@@ -667,24 +768,24 @@ class CommandLineInterface:
 
                 if verb.more_help:
 
-                    output += '\n'.join(
+                    output += ['\n'.join(
                         f'        {line}'
                         for line in verb.function(None).splitlines()
-                    ) + '\n'
+                    ) + '\n']
 
-                    output += '\n'
+                    output += ['\n']
 
 
 
             # Indicator to show that some verbs were filtered out.
 
             if verbs_were_filtered_out:
-                output += '    ...' '\n'
-                output += '\n'
+                output += ['    ...' '\n']
+                output += ['\n']
 
 
 
-        output = output.removesuffix('\n')
+        output = ''.join(output).removesuffix('\n')
 
         self.logger.info(output)
 
@@ -722,7 +823,7 @@ class CommandLineInterface:
                     f'Leftover verb properties: {repr(properties_of_verb)}.'
                 )
 
-            if any(verb_name == past_verb.name for past_verb in self.verbs):
+            if verb_name in self._verbs_by_name:
                 raise ValueError(
                     f'Verb name {repr(verb_name)} already used.'
                 )
@@ -765,6 +866,33 @@ class CommandLineInterface:
 
 
 
+                # How the default value is shown in the help.
+
+                if parameter_has_default:
+
+                    match parameter_default:
+
+                        case str() | int() | float() | bool():
+                            parameter_default_repr = repr(parameter_default)
+
+                        case _: # Not easily representable.
+                            parameter_default_repr = '(optional)'
+
+                else:
+                    parameter_default_repr = None
+
+
+
+                # Parameters that pick from a list of
+                # options have the options determined once.
+
+                match parameter_type:
+                    case dict()          : parameter_options = list(parameter_type.keys())
+                    case list() | tuple(): parameter_options = list(parameter_type)
+                    case _               : parameter_options = None
+
+
+
                 # Determine the formatted name.
 
                 parameter_formatted_name = f'{parameter_identifier_name.replace('_', '-')}'
@@ -781,7 +909,7 @@ class CommandLineInterface:
 
                 # The verb now has a new parameter.
 
-                parameter_schemas += [types.SimpleNamespace(
+                parameter_schemas.append(CommandLineInterfaceParameterSchema(
                     identifier_name = parameter_identifier_name,
                     formatted_name  = parameter_formatted_name,
                     flag_name       = parameter_identifier_name.replace('_', '-'),
@@ -789,20 +917,48 @@ class CommandLineInterface:
                     type            = parameter_type,
                     has_default     = parameter_has_default,
                     default         = parameter_default,
+                    default_repr    = parameter_default_repr,
                     flag_only       = parameter_flag_only,
-                )]
+                    options         = parameter_options,
+                ))
+
+
+
+            # The verb's usage line in the help output is
+            # fully determined by now, so it's only made once.
+
+            verb_usage = ''.join([
+                f'    > {ANSI_UNDERLINE}{ANSI_BOLD}{self.name} {ANSI_FG_GREEN}{verb_name}{ANSI_RESET}{ANSI_UNDERLINE}{ANSI_BOLD}',
+                *[f' {parameter_schema.formatted_name}' for parameter_schema in parameter_schemas],
+                f'{ANSI_RESET}' '\n',
+            ])
+
+
+
+            # Flag arguments get matched to their parameter by name;
+            # the first parameter with a given flag name takes it.
+
+            parameter_schemas_by_flag_name = {}
+
+            for parameter_schema in parameter_schemas:
+                parameter_schemas_by_flag_name.setdefault(parameter_schema.flag_name, parameter_schema)
 
 
 
             # Register the new verb.
 
-            self.verbs += [types.SimpleNamespace(
-                name              = verb_name,
-                description       = verb_description,
-                more_help         = verb_more_help,
-                parameter_schemas = parameter_schemas,
-                function          = function,
-            )]
+            verb = CommandLineInterfaceVerb(
+                name                           = verb_name,
+                description                    = verb_description,
+                more_help                      = verb_more_help,
+                parameter_schemas              = parameter_schemas,
+                parameter_schemas_by_flag_name = parameter_schemas_by_flag_name,
+                function                       = function,
+                usage                          = verb_usage,
+            )
+
+            self.verbs.append(verb)
+            self._verbs_by_name[verb_name] = verb
 
             return function
 
@@ -824,7 +980,7 @@ class CommandLineInterface:
 
             try:
 
-                self.invoke(sys.argv[1:])
+                self._dispatch(sys.argv[1:])
                 sys.exit(0)
 
             except KeyboardInterrupt:
@@ -839,13 +995,21 @@ class CommandLineInterface:
 
 
 
+        self._dispatch(given)
+
+
+
+    # Parse the given arguments and execute the verb.
+
+    def _dispatch(self, given):
+
+
+
         # Just show the help information if given no arguments.
 
         if not given:
 
-            self.help(types.SimpleNamespace(
-                verb_name = None,
-            ))
+            self.help(self.HELP_ALL_VERBS)
 
             return
 
@@ -855,15 +1019,11 @@ class CommandLineInterface:
 
         given_verb_name, *remaining_arguments = given
 
-        for verb in self.verbs:
-            if verb.name == given_verb_name:
-                break
+        verb = self._verbs_by_name.get(given_verb_name)
 
-        else:
+        if verb is None:
 
-            self.help(types.SimpleNamespace(
-                verb_name = None,
-            ))
+            self.help(self.HELP_ALL_VERBS)
 
             self.logger.error(did_you_mean(
                 'No verb goes by the name of {}.',
@@ -879,22 +1039,15 @@ class CommandLineInterface:
 
 
 
-            # Argument needs the flag prefix.
-
-            if not argument.startswith('--'):
-                return (None, argument)
+            # Argument needs the flag prefix, and the flag
+            # argument may have an assigned value associated with it.
 
+            flag_match = FLAG_ARGUMENT_PATTERN.fullmatch(argument)
 
+            if flag_match is None:
+                return (None, argument)
 
-            # The flag argument may have an
-            # assigned value associated with it.
-
-            flag_name, *flag_value = argument.removeprefix('--').split('=', 1)
-
-            if flag_value == []:
-                flag_value = None
-            else:
-                flag_value, = flag_value
+            flag_name, flag_value = flag_match.groups()
 
 
 
@@ -924,15 +1077,13 @@ class CommandLineInterface:
 
             # Look for parameter of the same flag name.
 
-            for parameter_schema_i, parameter_schema in enumerate(verb.parameter_schemas):
-                if parameter_schema.flag_name == flag_name:
-                    break
+            parameter_schema = verb.parameter_schemas_by_flag_name.get(flag_name)
 
 
 
             # Couldn't find a parameter that match the flag argument.
 
-            else:
+            if parameter_schema is None:
 
                 self.help(types.SimpleNamespace(
                     verb_name = verb.name,
@@ -1006,16 +1157,16 @@ class CommandLineInterface:
 
         # Pair up the remaining parameters and arguments.
 
-        while remaining_parameter_schemas and remaining_arguments:
+        for parameter_schema, argument in zip(remaining_parameter_schemas, remaining_arguments):
 
 
 
             # Some parameters can only be provided as flags.
 
-            if remaining_parameter_schemas[0].flag_only:
+            if parameter_schema.flag_only:
 
                 self.logger.error(
-                    f'Parameter {remaining_parameter_schemas[0].formatted_name} '
+                    f'Parameter {parameter_schema.formatted_name} '
                     f'must be provided as a flag.'
                 )
 
@@ -1023,15 +1174,14 @@ class CommandLineInterface:
 
 
 
-            parameters[remaining_parameter_schemas[0].identifier_name] = remaining_arguments[0]
-
-            del remaining_parameter_schemas[0]
-            del remaining_arguments[0]
+            parameters[parameter_schema.identifier_name] = argument
 
 
 
         # There shouldn't be any leftover arguments.
 
+        remaining_arguments = remaining_arguments[len(remaining_parameter_schemas):]
+
         if remaining_arguments:
 
             self.help(types.SimpleNamespace(
@@ -1094,22 +1244,13 @@ class CommandLineInterface:
 
                     case builtins.bool:
 
-                        FALSY  = ('0', 'f', 'n', 'no' , 'false')
-                        TRUTHY = ('1', 't', 'y', 'yes', 'true' )
+                        value = BOOLEAN_ARGUMENT_VALUES.get(value.lower())
 
-                        value = value.lower()
-
-                        if value in FALSY:
-                            value = False
-
-                        elif value in TRUTHY:
-                            value = True
-
-                        else:
+                        if value is None:
 
                             self.logger.error(
                                 f'Parameter {parameter_schema.formatted_name} must be a boolean; '
-                                f'can be {repr(FALSY)} or {repr(TRUTHY)}.'
+                                f'can be {repr(BOOLEAN_ARGUMENT_FALSY)} or {repr(BOOLEAN_ARGUMENT_TRUTHY)}.'
                             )
 
                             sys.exit(1)
@@ -1122,14 +1263,7 @@ class CommandLineInterface:
 
 
 
-                        options = parameter_schema.type
-
-                        if isinstance(parameter_schema.type, dict):
-                            options = list(parameter_schema.type.keys())
-
-
-
-                        if value not in options:
+                        if value not in parameter_schema.type:
 
                             self.help(types.SimpleNamespace(
                                 verb_name = verb.name,
@@ -1139,7 +1273,7 @@ class CommandLineInterface:
                                 f'Parameter {parameter_schema.formatted_name} '
                                 f'given invalid option of {{}}.',
                                 value,
-                                options,
+                                parameter_schema.options,
                             ))
 
                             sys.exit(1)
@@ -1381,128 +1515,221 @@ class MetaPreprocessorError(Exception):
 
 
 
-def metapreprocess(*,
-    output_directory_path,
-    source_file_paths,
-    callback = ...,
-    logger   = ...,
-):
+# The default logger's formatter, which displays
+# the source lines that a diagnostic points to.
 
+class MetaPreprocessorFormatter(logging.Formatter):
 
 
-    # Process the parameters.
 
-    output_directory_path = pathlib.Path(output_directory_path)
-    source_file_paths     = [
-        pathlib.Path(source_file_path)
-        for source_file_path in source_file_paths
-    ]
+    # The lines of each source file that has been read so far. Each call
+    # to `metapreprocess` replaces this with its own, which it shares with
+    # the scanning of meta-directives so that each source file only ever
+    # gets read and split once; this also means any handler made by an
+    # earlier call never shows lines that are now out-of-date.
 
+    source_file_lines = {}
 
 
-    # Provide the default logger that'll give good diagnostics.
 
-    if logger is ...:
+    def format(self, record):
 
-        class MetaPreprocessorFormatter(logging.Formatter):
 
-            def format(self, record):
 
+        # Some basic, common formattings.
 
+        message = super().format(record)
+        message = append_log_table(message, record)
+        message = prepend_log_level(message, record)
 
-                # Some basic, common formattings.
 
-                message = super().format(record)
-                message = append_log_table(message, record)
-                message = prepend_log_level(message, record)
 
+        # To give good error messages, we'll display
+        # the locations of the lines that are causing
+        # the issue.
 
+        if hasattr(record, 'frames'):
 
-                # To give good error messages, we'll display
-                # the locations of the lines that are causing
-                # the issue.
+            frame_lines       = []
+            gutter            = ''
+            source_file_lines = MetaPreprocessorFormatter.source_file_lines
 
-                if hasattr(record, 'frames'):
+            for frame in record.frames:
 
-                    frame_lines = []
-                    gutter      = ''
+                if frame.source_file_path not in source_file_lines:
+                    source_file_lines[frame.source_file_path] = frame.source_file_path.read_text().splitlines()
 
-                    for frame in record.frames:
-                        CONTEXT_MARGIN          = 3
-                        frame.source_file_lines = frame.source_file_path.read_text().splitlines()
-                        frame.minimum_index     = max(frame.line_number - 1 - CONTEXT_MARGIN, 0)
-                        frame.maximum_index     = min(frame.line_number - 1 + CONTEXT_MARGIN, len(frame.source_file_lines) - 1)
-                        gutter                  = ' ' * max(len(gutter), len(repr(frame.maximum_index + 1)))
+                CONTEXT_MARGIN          = 3
+                frame.source_file_lines = source_file_lines[frame.source_file_path]
+                frame.minimum_index     = max(frame.line_number - 1 - CONTEXT_MARGIN, 0)
+                frame.maximum_index     = min(frame.line_number - 1 + CONTEXT_MARGIN, len(frame.source_file_lines) - 1)
+                gutter                  = ' ' * max(len(gutter), len(repr(frame.maximum_index + 1)))
 
-                    for frame_i, frame in enumerate(record.frames):
+            gutter_width   = len(gutter)
+            gutter_margin  = f'{gutter} |'
+            gutter_divider = [
+                f'{gutter} :',
+                f'{gutter} : {ANSI_FG_BRIGHT_BLACK}{'.' * 80}{ANSI_RESET}',
+                f'{gutter} :',
+            ]
 
+            for frame_i, frame in enumerate(record.frames):
 
 
-                        # Small margin to give breathing room.
 
-                        if frame_i == 0:
-                            frame_lines += [f'{gutter} |']
+                # Small margin to give breathing room.
 
+                if frame_i == 0:
+                    frame_lines += [gutter_margin]
 
 
-                        # Have a little divider to show separate frame contexts.
 
-                        else:
-                            frame_lines += [
-                                f'{gutter} :',
-                                f'{gutter} : {ANSI_FG_BRIGHT_BLACK}{'.' * 80}{ANSI_RESET}',
-                                f'{gutter} :',
-                            ]
+                # Have a little divider to show separate frame contexts.
+
+                else:
+                    frame_lines += gutter_divider
+
+
+
+                # Grab some lines from the source code near the error.
+
+                context_lines = frame.source_file_lines[frame.minimum_index : frame.maximum_index + 1]
+
+                for source_line_index, source_line in enumerate(context_lines, frame.minimum_index):
+
+                    frame_line = f'{source_line_index + 1:>{gutter_width}} | '
 
+                    if source_line_index + 1 == frame.line_number:
+                        frame_line += ANSI_BG_RED + ANSI_BOLD
 
+                    frame_line += source_line
 
-                        # Grab some lines from the source code near the error.
+                    if source_line_index + 1 == frame.line_number:
+                        frame_line += ANSI_RESET
+                        frame_line += ANSI_FG_BRIGHT_YELLOW
+                        frame_line += f' <- {frame.source_file_path.as_posix()} : {frame.line_number}'
+                        frame_line += ANSI_RESET
 
-                        for source_line_index in range(frame.minimum_index, frame.maximum_index + 1):
+                    frame_lines += [frame_line]
 
-                            frame_line = f'{repr(source_line_index + 1).rjust(len(gutter))} | '
 
-                            if source_line_index + 1 == frame.line_number:
-                                frame_line += ANSI_BG_RED + ANSI_BOLD
 
-                            frame_line += frame.source_file_lines[source_line_index]
+                # Last frame, so insert some breathing room.
 
-                            if source_line_index + 1 == frame.line_number:
-                                frame_line += ANSI_RESET
-                                frame_line += ANSI_FG_BRIGHT_YELLOW
-                                frame_line += f' <- {frame.source_file_path.as_posix()} : {frame.line_number}'
-                                frame_line += ANSI_RESET
+                if frame_i == len(record.frames) - 1:
 
-                            frame_lines += [frame_line]
+                    frame_lines += [gutter_margin]
 
 
 
-                        # Last frame, so insert some breathing room.
+            # Put all the selected lines together
+            # to have a nice diagnostic.
+
+            message = '\n'.join(frame_lines) + ('\n' * 2) + message
+
+
+
+        message += '\n'
+
+        return message
+
 
-                        if frame_i == len(record.frames) - 1:
 
-                            frame_lines += [f'{gutter} |']
+# Everything we know about a single meta-directive. There can be
+# a lot of these, so the fields are stored in slots rather than in
+# a per-instance dictionary like with `types.SimpleNamespace`.
 
+@dataclasses.dataclass(slots = True)
+class MetaDirective:
+    source_file_path         : pathlib.Path
+    include_file_path        : pathlib.Path | None
+    include_line_number      : int | None
+    first_header_line_number : int | None
+    identifiers              : list
+    body_line_number         : int | None
+    body_lines               : list
+    meta_main_line_number    : int | None
 
 
-                    # Put all the selected lines together
-                    # to have a nice diagnostic.
 
-                    message = '\n'.join(frame_lines) + ('\n' * 2) + message
+# An include-directive right before a meta-directive determines where the
+# generated code will be written to. Include-directives and meta-directive
+# headers are recognized with a single match per source line; the named group
+# that participated tells which one the line is. Python source files write
+# their meta-directive headers with line comments while other languages use
+# block comments.
 
+PYTHON_SOURCE_LINE_PATTERN = re.compile(r'\s*#\s*(?:include\s*(?:"(.*)"|<(.*)>)|meta\b\s*(?P<meta_header>.*))')
+C_SOURCE_LINE_PATTERN      = re.compile(r'\s*(?:#\s*include\s*(?:"(.*)"|<(.*)>)|/\*\s*#\s*meta\b\s*(?P<meta_header>.*))')
 
 
-                message += '\n'
 
-                return message
+# The opening, closing, and indentation that `Meta.enter`
+# will use by default based on the header's leading keyword.
 
+META_ENTER_HEADER_PATTERN = re.compile(r'\s*(#define|#if|#ifdef|#elif|#else|assert|static_assert|_Static_assert|struct|union|enum|case)\b')
 
+META_ENTER_SUGGESTIONS = {
+    '#define'        : (None, None      , None),
+    '#if'            : (None, '#endif'  , None),
+    '#ifdef'         : (None, '#endif'  , None),
+    '#elif'          : (None, '#endif'  , None),
+    '#else'          : (None, '#endif'  , None),
+    'assert'         : ('(' , ');'      , None),
+    'static_assert'  : ('(' , ');'      , None),
+    '_Static_assert' : ('(' , ');'      , None),
+    'struct'         : ('{' , '};'      , None),
+    'union'          : ('{' , '};'      , None),
+    'enum'           : ('{' , '};'      , None),
+    'case'           : ('{' , '} break;', None),
+}
 
-        logger         = logging.getLogger('pxd_MetaPreprocessor')
-        logger_handler = logging.StreamHandler(sys.stdout)
-        logger_handler.setFormatter(MetaPreprocessorFormatter())
-        logger.addHandler(logger_handler)
-        logger.setLevel(logging.DEBUG)
+
+
+def metapreprocess(*,
+    output_directory_path,
+    source_file_paths,
+    callback = ...,
+    logger   = ...,
+):
+
+
+
+    # Process the parameters.
+
+    output_directory_path = pathlib.Path(output_directory_path)
+    source_file_paths     = [
+        pathlib.Path(source_file_path)
+        for source_file_path in source_file_paths
+    ]
+
+    output_directory_path.mkdir(parents = True, exist_ok = True)
+
+
+
+    # The lines of each source file that has been read so far; this is shared
+    # between the scanning of meta-directives and the diagnostics so that
+    # each source file only ever gets read and split once.
+
+    source_file_lines                           = {}
+    MetaPreprocessorFormatter.source_file_lines = source_file_lines
+
+
+
+    # Provide the default logger that'll give good diagnostics.
+
+    if logger is ...:
+
+        # The default logger persists across calls,
+        # so it only needs to be set up the first time.
+
+        logger = logging.getLogger('pxd_MetaPreprocessor')
+
+        if not logger.handlers:
+            logger_handler = logging.StreamHandler(sys.stdout)
+            logger_handler.setFormatter(MetaPreprocessorFormatter())
+            logger.addHandler(logger_handler)
+            logger.setLevel(logging.DEBUG)
 
 
 
@@ -1533,28 +1760,155 @@ def metapreprocess(*,
         output                 = yield
         end                    = time.time()
         delta                  = end - start
-        meta_directive_deltas += [(location, delta)]
+        meta_directive_deltas.append((location, delta))
         elapsed               += delta
 
 
 
-    if callback is ...:
-        callback = default_callback
+    if callback is ...:
+        callback = default_callback
+
+
+
+    # The meta-directives found in each source file are cached in the
+    # output directory so unchanged source files don't need to be parsed
+    # again on the next run. A source file is considered unchanged if the
+    # hash of its contents is the same; the modification time of this
+    # script is also taken into account in case the parsing changed.
+    # A missing, corrupted, or outdated cache is just started over.
+    # The cache only holds plain tuples so it can be stored with `marshal`;
+    # `pickle` could run arbitrary code from a tampered output directory.
+
+    parse_cache_file_path = pathlib.Path(output_directory_path, '__META_PARSE_CACHE__.marshal')
+    parse_cache_version   = pathlib.Path(__file__).stat().st_mtime_ns
+
+    try:
+        parse_cache = marshal.loads(parse_cache_file_path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        parse_cache = {}
+
+    if not isinstance(parse_cache, dict):
+        parse_cache = {}
+
+    def to_parse_cache_entry(meta_directive):
+        return (
+            None if meta_directive.include_file_path is None else str(meta_directive.include_file_path),
+            meta_directive.include_line_number,
+            meta_directive.first_header_line_number,
+            tuple(
+                (identifier.kind, identifier.name, identifier.line_number)
+                for identifier in meta_directive.identifiers
+            ),
+            meta_directive.body_line_number,
+            tuple(meta_directive.body_lines),
+            meta_directive.meta_main_line_number,
+        )
+
+    def from_parse_cache_entry(source_file_path, parse_cache_entry):
+
+        (
+            include_file_path,
+            include_line_number,
+            first_header_line_number,
+            identifiers,
+            body_line_number,
+            body_lines,
+            meta_main_line_number,
+        ) = parse_cache_entry
+
+        return MetaDirective(
+            source_file_path         = source_file_path,
+            include_file_path        = None if include_file_path is None else pathlib.Path(include_file_path),
+            include_line_number      = include_line_number,
+            first_header_line_number = first_header_line_number,
+            identifiers              = [
+                types.SimpleNamespace(kind = kind, name = name, line_number = line_number)
+                for kind, name, line_number in identifiers
+            ],
+            body_line_number         = body_line_number,
+            body_lines               = list(body_lines),
+            meta_main_line_number    = meta_main_line_number,
+        )
+
+    updated_parse_cache = {}
+
+
+
+    # Find all meta-directives.
+
+    meta_directives = []
+
+    for source_file_path in source_file_paths:
+
+        source_bytes = source_file_path.read_bytes()
+
+        parse_cache_key = (
+            parse_cache_version,
+            str(output_directory_path),
+            str(source_file_path),
+            hashlib.blake2b(source_bytes, digest_size = 16).digest(),
+        )
+
+        if parse_cache_key in parse_cache:
+            try:
+                meta_directives += [
+                    from_parse_cache_entry(source_file_path, parse_cache_entry)
+                    for parse_cache_entry in parse_cache[parse_cache_key]
+                ]
+            except (TypeError, ValueError):
+                pass
+            else:
+                updated_parse_cache[parse_cache_key] = parse_cache[parse_cache_key]
+                continue
+
+        source_file_meta_directives = []
+
+        # Every meta-directive header has "meta" in it, so a source file
+        # without it anywhere can be ruled out with a single search
+        # rather than going through each of its lines.
+
+        source_text = io.TextIOWrapper(io.BytesIO(source_bytes), encoding = io.text_encoding(None)).read()
+
+        if 'meta' in source_text:
+            source_lines                        = source_text.splitlines()
+            source_file_lines[source_file_path] = source_lines
+        else:
+            source_lines = []
+
+
+
+        # Rather than popping lines off, we move an index through the
+        # source file's lines; this index is also the line number
+        # of the line that was most recently parsed.
+
+        line_index = 0
+
+
+
+        # Python source files write their meta-directives with line comments
+        # while other languages use block comments; this is the same for
+        # every line in the file, so it's only determined once.
+
+        is_python_source_file = source_file_path.suffix == '.py'
+        source_line_pattern   = (
+            PYTHON_SOURCE_LINE_PATTERN if is_python_source_file else
+            C_SOURCE_LINE_PATTERN
+        )
 
+        while line_index < len(source_lines):
 
 
-    # Find all meta-directives.
 
-    meta_directives = []
+            # Include-directives and meta-directive headers both need a "#",
+            # so most lines of the source file can be skipped right away.
 
-    for source_file_path in source_file_paths:
+            if '#' not in source_lines[line_index]:
+                line_index += 1
+                continue
 
-        remaining_lines = source_file_path.read_text().splitlines()
-        total_lines     = len(remaining_lines)
 
-        while remaining_lines:
 
-            meta_directive = types.SimpleNamespace(
+            meta_directive = MetaDirective(
                 source_file_path         = source_file_path,
                 include_file_path        = None,
                 include_line_number      = None,
@@ -1567,55 +1921,50 @@ def metapreprocess(*,
 
 
 
-            # Parse for any include-directives that may prepend a meta-directive.
+            # Parse for any include-directives that may prepend a meta-directive
+            # and then the meta-directive's header lines, if there are any.
+            # Each line is only matched once to find out which one it is.
+
+            meta_directive_found = False
 
-            while remaining_lines:
+            while line_index < len(source_lines):
 
-                include_match = (
-                    re.match(r'\s*#\s*include\s*"(.*)"', remaining_lines[0]) or
-                    re.match(r'\s*#\s*include\s*<(.*)>', remaining_lines[0])
-                )
+                line_match = source_line_pattern.match(source_lines[line_index])
 
-                if not include_match:
+                if not line_match:
                     break
 
-                _, *remaining_lines = remaining_lines
 
-                meta_directive.include_file_path   = pathlib.Path(output_directory_path, include_match.groups()[0])
-                meta_directive.include_line_number = total_lines - len(remaining_lines)
 
+                # Include-directives can only come before the meta-directive's header.
 
+                if line_match['meta_header'] is None:
 
-            # Try parsing for a meta-directive.
-
-            meta_directive_found = False
+                    if meta_directive_found:
+                        break
 
-            while remaining_lines:
+                    line_index += 1
 
+                    meta_directive.include_file_path   = pathlib.Path(output_directory_path, line_match[line_match.lastindex])
+                    meta_directive.include_line_number = line_index
 
+                    continue
 
-                # See if the next line is part of a meta-directive's header.
 
-                meta_match = re.match(
-                    r'\s*#\s*meta\b\s*(.*)' if source_file_path.suffix == '.py' else
-                    r'\s*/\*\s*#\s*meta\b\s*(.*)',
-                    remaining_lines[0]
-                )
 
-                if not meta_match:
-                    break
+                # The line is part of a meta-directive's header.
 
-                remaining_lines = remaining_lines[1:]
+                line_index += 1
 
                 if not meta_directive_found:
                     meta_directive_found                    = True
-                    meta_directive.first_header_line_number = total_lines - len(remaining_lines)
+                    meta_directive.first_header_line_number = line_index
 
 
 
                 # Parse the meta-directive's header line.
 
-                match meta_match.groups()[0].strip().split(maxsplit = 1):
+                match line_match['meta_header'].split(maxsplit = 1):
 
 
 
@@ -1627,11 +1976,11 @@ def metapreprocess(*,
                         identifiers  = [
                             types.SimpleNamespace(
                                 kind        = kind,
-                                name        = identifier.strip(),
-                                line_number = total_lines - len(remaining_lines),
+                                name        = identifier_name,
+                                line_number = line_index,
                             )
                             for identifier in identifiers.split(',')
-                            if identifier.strip()
+                            if (identifier_name := identifier.strip())
                         ]
 
 
@@ -1646,7 +1995,7 @@ def metapreprocess(*,
                                     'frames' : (
                                         types.SimpleNamespace(
                                             source_file_path = source_file_path,
-                                            line_number      = total_lines - len(remaining_lines),
+                                            line_number      = line_index,
                                         ),
                                     ),
                                 },
@@ -1670,7 +2019,7 @@ def metapreprocess(*,
                                     'frames' : (
                                         types.SimpleNamespace(
                                             source_file_path = source_file_path,
-                                            line_number      = total_lines - len(remaining_lines),
+                                            line_number      = line_index,
                                         ),
                                     ),
                                 },
@@ -1694,7 +2043,7 @@ def metapreprocess(*,
                                     'frames' : (
                                         types.SimpleNamespace(
                                             source_file_path = source_file_path,
-                                            line_number      = total_lines - len(remaining_lines),
+                                            line_number      = line_index,
                                         ),
                                     ),
                                 },
@@ -1724,7 +2073,7 @@ def metapreprocess(*,
                                 'frames' : (
                                     types.SimpleNamespace(
                                         source_file_path = source_file_path,
-                                        line_number      = total_lines - len(remaining_lines),
+                                        line_number      = line_index,
                                     ),
                                 ),
                             },
@@ -1735,99 +2084,138 @@ def metapreprocess(*,
 
 
             if not meta_directive_found:
-                remaining_lines = remaining_lines[1:]
+                line_index += 1
                 continue
 
 
 
             # We now get the body of the meta-directive.
 
-            meta_directive.body_line_number = total_lines - len(remaining_lines) + 1
+            meta_directive.body_line_number = line_index + 1
             meta_directive.body_lines       = []
 
-            if source_file_path.suffix == '.py':
+            if is_python_source_file:
 
-                meta_directive.body_lines = remaining_lines
-                remaining_lines           = []
+                meta_directive.body_lines = source_lines[line_index:]
+                line_index                = len(source_lines)
 
             else:
 
-                while True:
 
-                    if not remaining_lines:
 
-                        logger.error(
-                            f'Meta-directive body not terminated with "*/"; reached end of file.',
-                            extra = {
-                                'frames' : (
-                                    types.SimpleNamespace(
-                                        source_file_path = source_file_path,
-                                        line_number      = meta_directive.first_header_line_number,
-                                    ),
-                                ),
-                            },
-                        )
+                # Find the line with the end of the body.
 
-                        raise MetaPreprocessorError
+                body_end_line_index = line_index
+
+                while body_end_line_index < len(source_lines) and '*/' not in source_lines[body_end_line_index]:
+                    body_end_line_index += 1
+
+                if body_end_line_index == len(source_lines):
 
-                    body_line, *remaining_lines = remaining_lines
+                    logger.error(
+                        f'Meta-directive body not terminated with "*/"; reached end of file.',
+                        extra = {
+                            'frames' : (
+                                types.SimpleNamespace(
+                                    source_file_path = source_file_path,
+                                    line_number      = meta_directive.first_header_line_number,
+                                ),
+                            ),
+                        },
+                    )
 
-                    ending = '*/' in body_line
+                    raise MetaPreprocessorError
 
-                    if ending:
-                        body_line = body_line[:body_line.index('*/')]
 
-                    meta_directive.body_lines += [body_line]
 
-                    if ending:
-                        break
+                # Everything up to the "*/" is the body; the rest
+                # of the line the "*/" is on gets skipped over.
+
+                body_end_line = source_lines[body_end_line_index]
+                body_text     = '\n'.join([
+                    *source_lines[line_index : body_end_line_index],
+                    body_end_line[:body_end_line.find('*/')],
+                ])
+                line_index    = body_end_line_index + 1
 
                 meta_directive.body_lines = deindent(
-                    '\n'.join(meta_directive.body_lines),
+                    body_text,
                     multilined_string_literal = False,
                     single_line_comment       = '#'
                 ).splitlines()
 
 
 
-            # Ensure all identifiers listed are unique.
+            # Ensure all identifiers listed are unique; usually they
+            # are, so the conflicts are only grouped up if there are any.
 
-            for name, conflicts in coalesce(
-                (identifier.name, identifier)
-                for identifier in meta_directive.identifiers
-            ):
+            identifier_names = {identifier.name for identifier in meta_directive.identifiers}
 
-                if len(conflicts) <= 1:
-                    continue
+            if len(identifier_names) != len(meta_directive.identifiers):
 
-                logger.error(
-                    f'Identifier {repr(name)} should not be listed multiple times.',
-                    extra = {
-                        'frames' : tuple({
-                            conflict.line_number : types.SimpleNamespace(
-                                source_file_path = source_file_path,
-                                line_number      = conflict.line_number,
-                            )
-                            for conflict in conflicts
-                        }.values())
-                    },
-                )
+                for name, conflicts in coalesce(
+                    (identifier.name, identifier)
+                    for identifier in meta_directive.identifiers
+                ):
 
-                raise MetaPreprocessorError
+                    if len(conflicts) <= 1:
+                        continue
+
+                    logger.error(
+                        f'Identifier {repr(name)} should not be listed multiple times.',
+                        extra = {
+                            'frames' : tuple({
+                                conflict.line_number : types.SimpleNamespace(
+                                    source_file_path = source_file_path,
+                                    line_number      = conflict.line_number,
+                                )
+                                for conflict in conflicts
+                            }.values())
+                        },
+                    )
+
+                    raise MetaPreprocessorError
 
 
 
-            meta_directives += [meta_directive]
+            source_file_meta_directives.append(meta_directive)
+
+        meta_directives                     += source_file_meta_directives
+        updated_parse_cache[parse_cache_key]  = tuple(map(to_parse_cache_entry, source_file_meta_directives))
+
+
+
+    # Save the parsed meta-directives for the next run; this is done
+    # before any of the meta-directives get modified down below.
+
+    parse_cache_file_path.write_bytes(marshal.dumps(updated_parse_cache))
+
+
+
+    # Group the meta-directives by their include file paths, by the
+    # identifiers they define, and collect the identifiers they import
+    # in a single pass; the conflict checks and the import validation
+    # below all work off of these.
+
+    include_file_path_meta_directives = collections.defaultdict(lambda: [])
+    identifier_name_definitions       = collections.defaultdict(lambda: [])
+    identifier_imports                = []
+
+    for meta_directive in meta_directives:
+
+        if meta_directive.include_file_path is not None:
+            include_file_path_meta_directives[meta_directive.include_file_path].append(meta_directive)
+
+        for identifier in meta_directive.identifiers:
+            match identifier.kind:
+                case 'export' | 'global' : identifier_name_definitions[identifier.name].append((identifier, meta_directive))
+                case 'import'            : identifier_imports.append((identifier, meta_directive))
 
 
 
     # Ensure each meta-directive's include file path is unique.
 
-    for include_file_path, conflicts in coalesce(
-        (meta_directive.include_file_path, meta_directive)
-        for meta_directive in meta_directives
-        if meta_directive.include_file_path is not None
-    ):
+    for include_file_path, conflicts in include_file_path_meta_directives.items():
 
         if len(conflicts) <= 1:
             continue
@@ -1851,12 +2239,7 @@ def metapreprocess(*,
 
     # Ensure each meta-directive's exported and global identifiers are unique.
 
-    for name, conflicts in coalesce(
-        (identifier.name, (identifier, meta_directive))
-        for meta_directive in meta_directives
-        for identifier     in meta_directive.identifiers
-        if identifier.kind in ('export', 'global')
-    ):
+    for name, conflicts in identifier_name_definitions.items():
 
         if len(conflicts) <= 1:
             continue
@@ -1880,39 +2263,29 @@ def metapreprocess(*,
 
     # Ensure each meta-directive import from an actual existing identifier.
 
-    all_defined_identifier_names = [
-        identifier.name
-        for meta_directive in meta_directives
-        for identifier     in meta_directive.identifiers
-        if identifier.kind in ('export', 'global')
-    ]
-
-    for meta_directive in meta_directives:
+    all_defined_identifier_names = list(identifier_name_definitions)
 
-        for identifier in meta_directive.identifiers:
+    for identifier, meta_directive in identifier_imports:
 
-            if (
-                identifier.kind == 'import' and
-                identifier.name not in all_defined_identifier_names
-            ):
+        if identifier.name not in identifier_name_definitions:
 
-                logger.error(
-                    did_you_mean(
-                        'Importing identifier {}, but no meta-directive exports that.',
-                        identifier.name,
-                        all_defined_identifier_names
-                    ),
-                    extra = {
-                        'frames' : (
-                            types.SimpleNamespace(
-                                source_file_path = meta_directive.source_file_path,
-                                line_number      = identifier.line_number,
-                            ),
-                        )
-                    },
-                )
+            logger.error(
+                did_you_mean(
+                    'Importing identifier {}, but no meta-directive exports that.',
+                    identifier.name,
+                    all_defined_identifier_names
+                ),
+                extra = {
+                    'frames' : (
+                        types.SimpleNamespace(
+                            source_file_path = meta_directive.source_file_path,
+                            line_number      = identifier.line_number,
+                        ),
+                    )
+                },
+            )
 
-                raise MetaPreprocessorError
+            raise MetaPreprocessorError
 
 
 
@@ -1926,24 +2299,30 @@ def metapreprocess(*,
         ):
             continue
 
+        existing_identifier_names = {
+            identifier.name
+            for identifier in meta_directive.identifiers
+        }
+
         meta_directive.identifiers += [
             types.SimpleNamespace(
                 kind = 'implicit',
                 name = name,
             )
             for name in all_defined_identifier_names
-            if name not in (identifier.name for identifier in meta_directive.identifiers)
+            if name not in existing_identifier_names
         ]
 
 
 
     # Meta-directives with global identifiers will have those identifiers be
     # implicitly imported into every other meta-directive without a global list.
+    # Each defined identifier is known to be unique at this point, so we can
+    # just pick out the global ones from the definitions grouped earlier.
 
     all_global_identifier_names = [
-        identifier.name
-        for meta_directive in meta_directives
-        for identifier     in meta_directive.identifiers
+        name
+        for name, ((identifier, meta_directive),) in identifier_name_definitions.items()
         if identifier.kind == 'global'
     ]
 
@@ -1955,95 +2334,126 @@ def metapreprocess(*,
         ):
             continue
 
+        existing_identifier_names = {
+            identifier.name
+            for identifier in meta_directive.identifiers
+        }
+
         meta_directive.identifiers += [
             types.SimpleNamespace(
                 kind = 'implicit',
                 name = name,
             )
             for name in all_global_identifier_names
-            if name not in (identifier.name for identifier in meta_directive.identifiers)
+            if name not in existing_identifier_names
         ]
 
 
 
-    # Sort the meta-directives.
+    # Sort the meta-directives such that each one comes after the meta-directives
+    # that define the identifiers it depends upon. Out of the meta-directives that
+    # are ready to be evaluated, the earliest one in the source files is picked first.
 
-    remaining_meta_directives  = meta_directives
-    meta_directives            = []
-    available_identifier_names = []
+    unsorted_meta_directives = meta_directives
+    meta_directives          = []
+    sorted_flags             = [False] * len(unsorted_meta_directives)
+    dependency_counts        = []
+    dependent_indices        = collections.defaultdict(lambda: [])
 
-    while remaining_meta_directives:
+    for meta_directive_i, meta_directive in enumerate(unsorted_meta_directives):
 
-        for meta_directive_i, meta_directive in enumerate(remaining_meta_directives):
+        dependency_names = {
+            identifier.name
+            for identifier in meta_directive.identifiers
+            if identifier.kind in ('import', 'implicit')
+        }
 
+        dependency_counts.append(len(dependency_names))
 
+        for dependency_name in dependency_names:
+            dependent_indices[dependency_name].append(meta_directive_i)
 
-            # See if all of the meta-directive's dependencies are satisfied.
+    ready_indices = [
+        meta_directive_i
+        for meta_directive_i, dependency_count in enumerate(dependency_counts)
+        if dependency_count == 0
+    ]
 
-            if not all(
-                identifier.name in available_identifier_names
-                for identifier in meta_directive.identifiers
-                if identifier.kind in ('import', 'implicit')
-            ):
-                continue
+    while ready_indices:
 
 
 
-            # All of the meta-directive's dependencies are satisfied,
-            # so it can be evaluated at this point and have all of its
-            # defined identifiers be added to the set.
+        # Acknowledge the earliest ready meta-directive as processed.
 
-            available_identifier_names += [
-                identifier.name
-                for identifier in meta_directive.identifiers
-                if identifier.kind in ('export', 'global')
-            ]
+        meta_directive_i               = heapq.heappop(ready_indices)
+        meta_directive                 = unsorted_meta_directives[meta_directive_i]
+        sorted_flags[meta_directive_i] = True
 
+        meta_directives.append(meta_directive)
 
 
-            # Acknowledge the meta-directive as processed.
 
-            meta_directives += [meta_directive]
-            del remaining_meta_directives[meta_directive_i]
-            break
+        # All of the meta-directive's defined identifiers are now available,
+        # so the meta-directives that depend on them might now be ready too.
 
+        for identifier in meta_directive.identifiers:
 
+            if identifier.kind not in ('export', 'global'):
+                continue
 
-        # There's likely some sort of circular dependency.
+            for dependent_i in dependent_indices[identifier.name]:
 
-        else:
+                dependency_counts[dependent_i] -= 1
 
-            logger.error(
-                f'Could not determine the next meta-directive to evaluate; '
-                f'there may be a circular dependency.',
-                extra = {
-                    'frames' : [
-                        types.SimpleNamespace(
-                            source_file_path = meta_directive.source_file_path,
-                            line_number      = meta_directive.first_header_line_number,
-                        )
-                        for meta_directive in remaining_meta_directives
-                        if any(identifier.kind != 'implicit' for identifier in meta_directive.identifiers)
-                    ]
-                },
-            )
+                if dependency_counts[dependent_i] == 0:
+                    heapq.heappush(ready_indices, dependent_i)
 
-            raise MetaPreprocessorError
+
+
+    # There's likely some sort of circular dependency.
+
+    if len(meta_directives) < len(unsorted_meta_directives):
+
+        logger.error(
+            f'Could not determine the next meta-directive to evaluate; '
+            f'there may be a circular dependency.',
+            extra = {
+                'frames' : [
+                    types.SimpleNamespace(
+                        source_file_path = meta_directive.source_file_path,
+                        line_number      = meta_directive.first_header_line_number,
+                    )
+                    for meta_directive_i, meta_directive in enumerate(unsorted_meta_directives)
+                    if not sorted_flags[meta_directive_i]
+                    if any(identifier.kind != 'implicit' for identifier in meta_directive.identifiers)
+                ]
+            },
+        )
+
+        raise MetaPreprocessorError
 
 
 
     # Create the top-level main function that'll
     # evaluate all of the meta-directives.
 
-    meta_main_lines = []
+    meta_main            = io.StringIO()
+    meta_main_line_count = 0
+
+    def write_meta_main(text):
+
+        nonlocal meta_main_line_count
 
-    meta_main_lines += deindent(
+        meta_main.write(text)
+        meta_main_line_count += text.count('\n')
+
+    write_meta_main(deindent(
         '''
                 def __META_MAIN_FUNCTION__(__META_DIRECTIVE_DECORATOR__):
                     pass
 
         '''
-    ).splitlines()
+    ))
 
 
 
@@ -2081,75 +2491,112 @@ def metapreprocess(*,
 
 
         # Make the meta-directive function that'll be executed by the decorator.
-
-        meta_main_lines += deindent(
-            f'''
-                    @__META_DIRECTIVE_DECORATOR__({meta_directive_i})
-                    def __META_DIRECTIVE_FUNCTION__({', '.join(parameters)}):
-
-                        global {', '.join(identifiers_to_be_defined)}
-
-            '''
-        , indent = ' ' * 4).splitlines()
+        # This is written out already indented since it's done for every
+        # meta-directive and there's nothing that needs to be deindented.
+
+        write_meta_main(
+            f'    @__META_DIRECTIVE_DECORATOR__({meta_directive_i})\n'
+            f'    def __META_DIRECTIVE_FUNCTION__({', '.join(parameters)}):\n'
+            f'\n'
+            f'        global {', '.join(identifiers_to_be_defined)}\n'
+            f'\n'
+        )
 
 
 
         # Insert the code for the meta-directive.
 
-        meta_directive.meta_main_line_number = len(meta_main_lines) + 1
+        meta_directive.meta_main_line_number = meta_main_line_count + 1
 
-        meta_main_lines += deindent(
+        write_meta_main(deindent(
             '\n'.join(meta_directive.body_lines) + '\n',
             indent = ' ' * 8,
-        ).splitlines()
+        ))
 
 
 
     # Output the Python script of all meta-directives.
     # This is purely for debugging and diagnostics.
 
-    meta_main_content = '\n'.join(meta_main_lines) + '\n'
+    meta_main_content = meta_main.getvalue()
 
     meta_main_file_path = pathlib.Path(output_directory_path, '__META_MAIN__.py')
 
-    meta_main_file_path.parent.mkdir(parents = True, exist_ok = True)
-
     meta_main_file_path.write_text(meta_main_content)
 
 
 
-    # Parse each meta-directive individually
-    # to catch any syntax errors.
+    # Create the directories for all of the include files up front
+    # rather than when each meta-directive's output is written.
 
-    for meta_directive in meta_directives:
+    for include_directory_path in {
+        meta_directive.include_file_path.parent
+        for meta_directive in meta_directives
+        if meta_directive.include_file_path is not None
+    }:
+        include_directory_path.mkdir(parents = True, exist_ok = True)
 
-        try:
 
-            compile(
-                '\n'.join(meta_directive.body_lines),
-                filename = (filename := '__META_DIRECTIVE_PARSE__'),
-                mode     = 'exec',
-                flags    = ast.PyCF_ONLY_AST,
-            )
 
-        except SyntaxError as error:
+    # The compiled code of the meta-main script is cached in the
+    # output directory so it doesn't need to be compiled again on the
+    # next run if none of the meta-directives changed. The cache is keyed
+    # by the hash of the script and the version of the bytecode format.
 
-            if error.filename != filename:
-                raise
+    meta_main_code_cache_file_path = pathlib.Path(output_directory_path, '__META_MAIN__.marshal')
+    meta_main_code_cache_key       = hashlib.blake2b(
+        importlib.util.MAGIC_NUMBER + meta_main_content.encode(),
+        digest_size = 16,
+    ).digest()
 
-            logger.error(
-                f'Syntax error: {repr(error.msg)}.',
-                extra = {
-                    'frames' : (
-                        types.SimpleNamespace(
-                            source_file_path = meta_directive.source_file_path,
-                            line_number      = meta_directive.body_line_number + error.lineno - 1,
-                        ),
-                    )
-                },
-            )
+    try:
+        meta_main_code_cache = meta_main_code_cache_file_path.read_bytes()
+        meta_main_code       = (
+            marshal.loads(meta_main_code_cache.removeprefix(meta_main_code_cache_key))
+            if meta_main_code_cache.startswith(meta_main_code_cache_key)
+            else None
+        )
+    except (OSError, EOFError, ValueError, TypeError):
+        meta_main_code = None
+
+    if meta_main_code is None:
+
+        # Parse each meta-directive individually to catch any syntax errors.
+        # A cached script was made from the exact same meta-directives that
+        # already passed these checks, so this is only done when compiling.
+
+        for meta_directive in meta_directives:
+
+            try:
+
+                compile(
+                    '\n'.join(meta_directive.body_lines),
+                    filename = (filename := '__META_DIRECTIVE_PARSE__'),
+                    mode     = 'exec',
+                    flags    = ast.PyCF_ONLY_AST,
+                )
+
+            except SyntaxError as error:
+
+                if error.filename != filename:
+                    raise
+
+                logger.error(
+                    f'Syntax error: {repr(error.msg)}.',
+                    extra = {
+                        'frames' : (
+                            types.SimpleNamespace(
+                                source_file_path = meta_directive.source_file_path,
+                                line_number      = meta_directive.body_line_number + error.lineno - 1,
+                            ),
+                        )
+                    },
+                )
+
+                raise MetaPreprocessorError from error
 
-            raise MetaPreprocessorError from error
+        meta_main_code = compile(meta_main_content, '__META_MAIN_FILE__', 'exec')
+        meta_main_code_cache_file_path.write_bytes(meta_main_code_cache_key + marshal.dumps(meta_main_code))
 
 
 
@@ -2178,6 +2625,8 @@ def metapreprocess(*,
 
 
 
+            indent = ' ' * 4 * Meta.indent
+
             for arg in args:
 
                 match arg:
@@ -2186,13 +2635,25 @@ def metapreprocess(*,
 
                 for string in strings:
 
-                    for line in deindent(string).splitlines():
+
+
+                    # Most strings are just a single line with no leading
+                    # indentation, so there's nothing to deindent nor split.
+                    # Note that `str.isprintable` is false for tabs and any
+                    # character that `str.splitlines` would split on.
+
+                    if string.isprintable() and not string.startswith(' '):
+                        lines = (string,) if string else ()
+                    else:
+                        lines = deindent(string).splitlines()
+
+                    for line in lines:
 
 
 
                         # Reindent.
 
-                        line = ' ' * 4 * Meta.indent + line
+                        line = indent + line
 
 
 
@@ -2211,7 +2672,7 @@ def metapreprocess(*,
 
                         # Next line!
 
-                        Meta.output += line + '\n'
+                        Meta.output.append(line)
 
 
 
@@ -2224,18 +2685,15 @@ def metapreprocess(*,
 
             # Determine the scope parameters.
 
-            header_is = lambda *keywords: header is not None and re.search(fr'^\s*({'|'.join(keywords)})\b', header)
+            header_match   = header is not None and META_ENTER_HEADER_PATTERN.match(header)
+            defining_macro = bool(header_match) and header_match[1] == '#define'
 
-            if defining_macro := header_is('#define'):
+            if defining_macro:
                 Meta.within_macro = True
 
-            if   defining_macro                                         : suggestion = (None, None      , None)
-            elif header_is('#if', '#ifdef', '#elif', '#else')           : suggestion = (None, '#endif'  , None)
-            elif header_is('assert', 'static_assert', '_Static_assert') : suggestion = ('(' , ');'      , None)
-            elif header_is('struct', 'union', 'enum')                   : suggestion = ('{' , '};'      , None)
-            elif header_is('case')                                      : suggestion = ('{' , '} break;', None)
-            elif header is not None and header.strip().endswith('=')    : suggestion = ('{' , '};'      , True)
-            else                                                        : suggestion = ('{' , '}'       , None)
+            if   header_match                                        : suggestion = META_ENTER_SUGGESTIONS[header_match[1]]
+            elif header is not None and header.strip().endswith('=') : suggestion = ('{' , '};', True)
+            else                                                     : suggestion = ('{' , '}' , None)
 
             if opening  is None: opening  = suggestion[0]
             if closing  is None: closing  = suggestion[1]
@@ -2368,18 +2826,13 @@ def metapreprocess(*,
                         enum {self.enum_name}{enum_type_suffix}
                     '''):
 
-                        for name, value, just_name in justify(
-                            (
-                                (None, name ),
-                                (None, value),
-                                ('<' , name ),
-                            )
-                            for name, value in self.members
-                        ):
+                        name_width = max(len(name) for name, value in self.members)
+
+                        for name, value in self.members:
                             if value is ...:
                                 Meta.line(f'{name},')
                             else:
-                                Meta.line(f'{just_name} = {value},')
+                                Meta.line(f'{name.ljust(name_width)} = {value},')
 
 
 
@@ -2458,6 +2911,20 @@ def metapreprocess(*,
 
 
 
+            # Most macros are just a name with a single-line expansion,
+            # so we can output those right away.
+
+            if len(args) == 2 and not overloading and not do_while:
+
+                name, expansion = args
+                expansion       = c_repr(expansion)
+
+                if expansion.isprintable() and not expansion.startswith(' '):
+                    Meta.line(f'#define {name} {expansion}')
+                    return
+
+
+
             # Parse syntax of the call.
 
             match args:
@@ -2609,26 +3076,30 @@ def metapreprocess(*,
 
 
 
-            # Make each table row have an index, or have it be `None` if not provided.
+            # Normalize each table row into its index (or `None` if not provided)
+            # and the type, name, and value of each of its members, all in C.
+
+            normalized_rows = []
 
-            table_rows = list(list(row) for row in table_rows)
+            for row in table_rows:
+
+                row = list(row)
 
-            for row_i, row in enumerate(table_rows):
                 if row and (isinstance(row[0], tuple) or isinstance(row[0], list)):
-                    table_rows[row_i] = [None, *row]
+                    row = [None, *row]
 
+                row_indexing, *members = row
 
+                if row_indexing is not None:
+                    row_indexing = c_repr(row_indexing)
 
-            # Determine the type of each member.
 
-            row_indexing_justification = max(
-                len(c_repr(row_indexing)) if row_indexing is not None else 0
-                for row_indexing, *members in table_rows
-            )
 
-            for table_row_i, (row_indexing, *members) in enumerate(table_rows):
+                # Determine the type of each member.
+
+                normalized_members = []
 
-                for member_i, member in enumerate(members):
+                for member in members:
 
                     match member:
 
@@ -2660,14 +3131,22 @@ def metapreprocess(*,
 
 
 
-                    members[member_i] = [member_type, member_name, c_repr(member_value)]
+                    normalized_members.append((member_type, member_name, c_repr(member_value)))
 
 
 
-                table_rows[table_row_i] = [
-                    c_repr(row_indexing).ljust(row_indexing_justification) if row_indexing is not None else None,
-                    members
-                ]
+                normalized_rows.append((row_indexing, normalized_members))
+
+            table_rows = normalized_rows
+
+
+
+            # Row indices are left-justified together.
+
+            row_indexing_justification = max(
+                (len(row_indexing) for row_indexing, members in table_rows if row_indexing is not None),
+                default = 0
+            )
 
 
 
@@ -2691,12 +3170,12 @@ def metapreprocess(*,
 
                     case [[first_row_indexing, first_row_members], *rest]:
 
-                        table_type = f'struct {{ {' '.join(
-                            [
-                                f'{member_type if member_type is not None else f'typeof({member_value})'} {member_name};'
-                                for member_type, member_name, member_value in first_row_members
-                            ] if table_rows else []
-                        )} }}'
+                        member_declarations = [
+                            f'{member_type if member_type is not None else f'typeof({member_value})'} {member_name};'
+                            for member_type, member_name, member_value in first_row_members
+                        ]
+
+                        table_type = f'struct {{ {' '.join(member_declarations)} }}'
 
 
 
@@ -2707,19 +3186,33 @@ def metapreprocess(*,
 
             # Generate the table with nice, aligned columns.
 
+            rendered_rows = [
+                [
+                    f'[{row_indexing.ljust(row_indexing_justification)}] = ' if row_indexing is not None else '',
+                    *(
+                        f'.{member_name} = {member_value}'
+                        for member_type, member_name, member_value in members
+                    ),
+                ]
+                for row_indexing, members in table_rows
+            ]
+
+            column_widths = [0] * max(map(len, rendered_rows), default = 0)
+
+            for rendered_row in rendered_rows:
+                for column_i, cell in enumerate(rendered_row):
+                    column_widths[column_i] = max(column_widths[column_i], len(cell))
+
+            for rendered_row in rendered_rows:
+                for column_i, cell in enumerate(rendered_row):
+                    rendered_row[column_i] = cell.ljust(column_widths[column_i])
+
             with Meta.enter(f'static const {table_type} {table_name}[] ='):
 
-                for just_row_indexing, *just_fields in justify(
-                    (
-                        ('<', f'[{row_indexing}] = ' if row_indexing is not None else ''),
-                        *(
-                            ('<', f'.{member_name} = {member_value}')
-                            for member_type, member_name, member_value in members
-                        ),
-                    )
-                    for row_indexing, members in table_rows
-                ):
-                    Meta.line(f'{just_row_indexing}{{ {', '.join(just_fields)} }},')
+                Meta.line(
+                    f'{just_row_indexing}{{ {', '.join(just_fields)} }},'
+                    for just_row_indexing, *just_fields in rendered_rows
+                )
 
 
 
@@ -2754,11 +3247,11 @@ def metapreprocess(*,
 
             # List the identifiers that the meta-directive will depend upon.
 
-            parameters = { 'Meta' : Meta } | {
-                identifier.name : defined_identifiers[identifier.name]
-                for identifier in meta_directive.identifiers
-                if identifier.kind in ('import', 'implicit')
-            }
+            parameters = { 'Meta' : Meta }
+
+            for identifier in meta_directive.identifiers:
+                if identifier.kind in ('import', 'implicit'):
+                    parameters[identifier.name] = defined_identifiers[identifier.name]
 
 
 
@@ -2767,7 +3260,7 @@ def metapreprocess(*,
             function_globals = {}
 
             Meta.meta_directive = meta_directive
-            Meta.output         = ''
+            Meta.output         = []
             Meta.indent         = 0
             Meta.within_macro   = False
             Meta.overloads      = {}
@@ -2812,11 +3305,22 @@ def metapreprocess(*,
 
                 # Look at the stack frames from when
                 # we began to evaluate the meta-directive.
+                # Only the file names and line numbers are
+                # needed, so the source lines aren't looked up.
 
-                traces = traceback.extract_tb(sys.exc_info()[2])
+                traces = traceback.StackSummary.extract(
+                    traceback.walk_tb(error.__traceback__),
+                    lookup_lines = False,
+                )
 
-                while traces and traces[0].name != '__META_DIRECTIVE_FUNCTION__':
-                    del traces[0]
+                traces = traces[next(
+                    (
+                        trace_i
+                        for trace_i, trace in enumerate(traces)
+                        if trace.name == '__META_DIRECTIVE_FUNCTION__'
+                    ),
+                    len(traces)
+                ):]
 
 
 
@@ -2825,6 +3329,17 @@ def metapreprocess(*,
 
                 frames = []
 
+
+
+                # The meta-directives are laid out in order in the meta-main
+                # script, so the one that a line belongs to can be found with
+                # a binary search on where each meta-directive starts.
+
+                meta_main_line_numbers = [
+                    meta_directive.meta_main_line_number
+                    for meta_directive in meta_directives
+                ]
+
                 for trace in traces:
 
 
@@ -2835,11 +3350,8 @@ def metapreprocess(*,
 
                     if trace.filename == '__META_MAIN_FILE__':
 
-                        (body_line_index, meta_directive), *_ = sorted(
-                            (trace.lineno - meta_directive.meta_main_line_number, meta_directive)
-                            for meta_directive in meta_directives
-                            if trace.lineno >= meta_directive.meta_main_line_number
-                        )
+                        meta_directive  = meta_directives[bisect.bisect_right(meta_main_line_numbers, trace.lineno) - 1]
+                        body_line_index = trace.lineno - meta_directive.meta_main_line_number
 
                         frames += [types.SimpleNamespace(
                             source_file_path = meta_directive.source_file_path,
@@ -2907,7 +3419,7 @@ def metapreprocess(*,
                 # We need to insert some stuff at the beginning of the file...
 
                 generated   = Meta.output
-                Meta.output = ''
+                Meta.output = []
 
 
 
@@ -2933,24 +3445,25 @@ def metapreprocess(*,
 
                         # Output the master macro.
 
-                        Meta.define(
-                            f'{macro}({', '.join(parameters)})',
+                        Meta.line(
+                            f'#define {macro}({', '.join(parameters)}) '
                             f'__MACRO_OVERLOAD__{macro}__##{'##'.join(overloading)}{argument_list}'
                         )
 
 
 
-                # Put back the rest of the code that was generated.
+                # Put back the rest of the code that was generated; it goes
+                # through `Meta.line` like any other text so that it gets
+                # normalized the same way (e.g. a leading empty line is dropped).
 
                 if generated:
-                    Meta.line(generated)
+                    Meta.line(''.join(f'{line}\n' for line in generated))
 
 
 
                 # Spit out the generated code.
 
-                pathlib.Path(Meta.meta_directive.include_file_path).parent.mkdir(parents = True, exist_ok = True)
-                pathlib.Path(Meta.meta_directive.include_file_path).write_text(Meta.output)
+                Meta.meta_directive.include_file_path.write_text(''.join(f'{line}\n' for line in Meta.output))
 
 
 
@@ -2995,15 +3508,16 @@ def metapreprocess(*,
 
     meta_main_globals = {}
 
-    exec(compile(meta_main_content, '__META_MAIN_FILE__', 'exec'), {}, meta_main_globals)
+    exec(meta_main_code, {}, meta_main_globals)
 
     meta_main_globals['__META_MAIN_FUNCTION__'](__META_DIRECTIVE_DECORATOR__)
 
 
 
-    # Log the performance of the meta-preprocessor.
+    # Log the performance of the meta-preprocessor;
+    # the table is only built if it'd actually be shown.
 
-    if callback == default_callback:
+    if callback == default_callback and logger.isEnabledFor(logging.DEBUG):
 
         logger.debug(
             f'Meta-preprocessing {len(meta_directive_deltas)} meta-directives took {elapsed :.3f}s.',
@@ -3127,7 +3641,14 @@ def parse_sexp(input, mapping = default_mapping):
             # Strip single-line comment.
 
             elif input[0] == '#':
-                input        = '\n'.join(input.split('\n', maxsplit = 1)[1:])
+
+                newline_index = input.find('\n')
+
+                if newline_index == -1:
+                    input = ''
+                else:
+                    input = input[newline_index + 1:]
+
                 line_number += 1
 
 
@@ -3175,7 +3696,7 @@ def parse_sexp(input, mapping = default_mapping):
                 if input and input[0] == ')':
                     break
                 else:
-                    values += [eat_expr()]
+                    values.append(eat_expr())
 
 
 
@@ -3308,6 +3829,16 @@ def parse_sexp(input, mapping = default_mapping):
 
 
 
+# Each citation attribute is checked for on every citation,
+# so the patterns for them are only compiled once.
+
+CITATION_ATTRIBUTE_PATTERNS = {
+    attribute : re.compile(fr'{attribute}\b')
+    for attribute in ('pg', 'sec', 'fig', 'tbl')
+}
+
+
+
 def process_citations(
     *,
     file_paths,
@@ -3324,6 +3855,13 @@ def process_citations(
 
 
 
+    # Characters that table and section numbers are made of.
+
+    ALPHANUMERIC_CHARACTERS = frozenset(string.ascii_lowercase + string.ascii_uppercase + string.digits)
+    NUMBERING_CHARACTERS    = ALPHANUMERIC_CHARACTERS | { '.', '-' }
+
+
+
     # We'll be keeping track of any issues we find.
 
     issues = []
@@ -3389,7 +3927,7 @@ def process_citations(
 
             for attribute in citation.attributes:
 
-                if re.match(f'{attribute}\\b', text):
+                if CITATION_ATTRIBUTE_PATTERNS[attribute].match(text):
 
                     value, *text = text.split('/', maxsplit = 1)
 
@@ -3499,12 +4037,9 @@ def process_citations(
 
                 if value is not None and not (
                     len(value) >= 1
-                    and value[ 0] in string.ascii_lowercase + string.ascii_uppercase + string.digits
-                    and value[-1] in string.ascii_lowercase + string.ascii_uppercase + string.digits
-                    and all(
-                        character in string.ascii_lowercase + string.ascii_uppercase + string.digits + '.-'
-                        for character in value
-                    )
+                    and value[ 0] in ALPHANUMERIC_CHARACTERS
+                    and value[-1] in ALPHANUMERIC_CHARACTERS
+                    and NUMBERING_CHARACTERS.issuperset(value)
                 ):
                     push_issue(
                         [citation],
@@ -3524,7 +4059,7 @@ def process_citations(
 
 
 
-            all_citations += [citation]
+            all_citations.append(citation)
 
 
 
@@ -3635,6 +4170,12 @@ def process_citations(
             ).strip(),
         )
 
+    reference_type_colorings = {
+        'url' : f'{ANSI_BG_CYAN}{ANSI_FG_BLACK}',
+        ':'   : f'{ANSI_BG_GREEN}{ANSI_FG_BLACK}',
+        None  : f'{ANSI_FG_GREEN}',
+    }
+
     citation_table_output = ''
 
     for citation, just_file_path, just_line_number in justify(
@@ -3657,11 +4198,7 @@ def process_citations(
             just_line_number,
             citation,
             (
-                {
-                    'url' : f'{ANSI_BG_CYAN}{ANSI_FG_BLACK}',
-                    ':'   : f'{ANSI_BG_GREEN}{ANSI_FG_BLACK}',
-                    None  : f'{ANSI_FG_GREEN}',
-                }[citation.reference_type]
+                reference_type_colorings[citation.reference_type]
                 if reference_text_to_find is None else
                 ANSI_BG_MAGENTA
             ),
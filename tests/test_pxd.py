@@ -0,0 +1,91 @@
+import sys, types, pathlib, tempfile, unittest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import pxd
+
+
+
+################################################################################
+#
+# Log formatting.
+#
+
+
+
+class TestPrependLogLevel(unittest.TestCase):
+
+    def test_single_line_message_is_prefixed(self):
+
+        self.assertEqual(
+            pxd.prepend_log_level('hello', types.SimpleNamespace(levelname = 'INFO')),
+            f'{pxd.ANSI_RESET}{pxd.ANSI_FG_CYAN}[INFO]{pxd.ANSI_RESET} hello',
+        )
+
+    def test_carriage_return_continues_with_indent(self):
+
+        self.assertEqual(
+            pxd.prepend_log_level('hello\rworld', types.SimpleNamespace(levelname = 'INFO')),
+            f'{pxd.ANSI_RESET}{pxd.ANSI_FG_CYAN}[INFO]{pxd.ANSI_RESET} hello\n       world',
+        )
+
+
+
+################################################################################
+#
+# Meta-preprocessor.
+#
+
+
+
+def metapreprocess_source(source):
+
+    with tempfile.TemporaryDirectory() as temporary_directory_path:
+
+        source_file_path = pathlib.Path(temporary_directory_path, 'source.c')
+        source_file_path.write_text(source)
+
+        output_directory_path = pathlib.Path(temporary_directory_path, 'output')
+
+        pxd.metapreprocess(
+            output_directory_path = output_directory_path,
+            source_file_paths     = [source_file_path],
+            callback              = None,
+        )
+
+        return pathlib.Path(output_directory_path, 'source.meta').read_text()
+
+
+
+class TestMetaPreprocessorOutput(unittest.TestCase):
+
+    def test_trailing_empty_line_is_kept(self):
+
+        self.assertEqual(
+            metapreprocess_source(
+                '#include "source.meta"\n'
+                '/* #meta\n'
+                'Meta.line("int x;")\n'
+                'Meta.line()\n'
+                '*/\n'
+            ),
+            'int x;\n\n',
+        )
+
+    def test_leading_empty_line_is_dropped(self):
+
+        self.assertEqual(
+            metapreprocess_source(
+                '#include "source.meta"\n'
+                '/* #meta\n'
+                'Meta.line()\n'
+                'Meta.line("int x;")\n'
+                '*/\n'
+            ),
+            'int x;\n',
+        )
+
+
+
+if __name__ == '__main__':
+    unittest.main()